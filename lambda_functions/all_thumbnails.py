@@ -1,15 +1,68 @@
 import json
 import boto3
+from botocore.config import Config
 import traceback
+import os
+import logging
+from operator import itemgetter
+
+# Use orjson for response serialization when it is bundled with the
+# deployment package, falling back to the standard library otherwise
+try:
+    import orjson
+
+    def to_json(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    def to_json(obj):
+        return json.dumps(obj)
+
+# Module-level logger; set LOG_LEVEL=DEBUG to log full incoming events
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+# botocore client configuration
+# tcp_keepalive keeps the connection to S3 open between warm invocations
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'max_attempts': 3, 'mode': 'adaptive'}
+)
 
 # Initialize the S3 client
 # This creates a low-level client representing Amazon Simple Storage Service (S3)
-s3 = boto3.client('s3')
+s3 = boto3.client('s3', config=boto_config)
 
 # Define the S3 bucket name where thumbnails are stored
 # This should be configured as an environment variable in production
 BUCKET_NAME = 'photo-sharing-bucket-thumbnail'
 
+# Maximum number of thumbnails returned per request
+MAX_THUMBNAILS = int(os.environ.get('MAX_THUMBNAILS', '20'))
+
+# Build the list_objects_v2 paginator once per container
+list_paginator = s3.get_paginator('list_objects_v2')
+
+# Pre-built accessor for the object key in list results
+get_key = itemgetter('Key')
+
+# CORS headers configuration
+# These headers enable cross-origin requests from any domain (*)
+# In production, you might want to restrict the allowed origin
+CORS_HEADERS = {
+    "Content-Type": "application/json",
+    "Access-Control-Allow-Origin": "*",  # Allows requests from any origin
+    "Access-Control-Allow-Headers": "Content-Type, Authorization",  # Allowed headers
+    "Access-Control-Allow-Methods": "GET, OPTIONS"  # Allowed HTTP methods
+}
+
+# Preflight response is identical for every request, so build it once
+CORS_PREFLIGHT_RESPONSE = {
+    "statusCode": 200,
+    "headers": CORS_HEADERS,
+    "body": to_json({"message": "CORS preflight OK"})
+}
+
 def lambda_handler(event, context):
     """
     AWS Lambda function handler for retrieving photo thumbnails from S3.
@@ -28,28 +81,14 @@ def lambda_handler(event, context):
         dict: Response object with status code, headers, and body
     """
     
-    # CORS headers configuration
-    # These headers enable cross-origin requests from any domain (*)
-    # In production, you might want to restrict the allowed origin
-    headers = {
-        "Content-Type": "application/json",
-        "Access-Control-Allow-Origin": "*",  # Allows requests from any origin
-        "Access-Control-Allow-Headers": "Content-Type, Authorization",  # Allowed headers
-        "Access-Control-Allow-Methods": "GET, OPTIONS"  # Allowed HTTP methods
-    }
-
     # Log the incoming event for debugging purposes
-    print("Event received:", json.dumps(event, indent=2))
+    # The event is only formatted when DEBUG logging is enabled
+    logger.debug("Event received: %s", event)
 
     # Handle CORS preflight OPTIONS request
     # Browsers send OPTIONS requests first to check CORS permissions
     if event.get("httpMethod") == "OPTIONS":
-        print("CORS preflight request received.")
-        return {
-            "statusCode": 200,
-            "headers": headers,
-            "body": json.dumps({"message": "CORS preflight OK"})
-        }
+        return CORS_PREFLIGHT_RESPONSE
 
     try:
         # Main function logic - retrieve thumbnails from S3
@@ -57,28 +96,37 @@ def lambda_handler(event, context):
         print(f"Listing objects from bucket: {BUCKET_NAME}")
         
         # List objects in the S3 bucket
-        # Using list_objects_v2 API with MaxKeys=20 to limit response size
-        response = s3.list_objects_v2(
+        # The paginator follows continuation tokens and stops once
+        # MAX_THUMBNAILS keys have been collected
+        pages = list_paginator.paginate(
             Bucket=BUCKET_NAME,
-            MaxKeys=20  # Limit to 20 objects to prevent large responses
+            PaginationConfig={
+                'MaxItems': MAX_THUMBNAILS,  # Cap total objects to prevent large responses
+                'PageSize': MAX_THUMBNAILS
+            }
         )
         
-        # Get the contents list or default to empty list if not present
-        contents = response.get('Contents', [])
+        # Collect the contents of each page (a page may have no 'Contents')
+        contents = []
+        for page in pages:
+            contents.extend(page.get('Contents', []))
+            if len(contents) >= MAX_THUMBNAILS:
+                break
+        contents = contents[:MAX_THUMBNAILS]
         print(f"Found {len(contents)} objects in bucket.")
         
         # Extract just the object names (keys) from the S3 response
         # We create a list of dictionaries with just the 'name' field
         # This structure makes it easier for frontend to consume
-        thumbnails = [{"name": obj['Key']} for obj in contents]
+        thumbnails = [{"name": key} for key in map(get_key, contents)]
 
         print(f"Returning {len(thumbnails)} thumbnail names.")
         
         # Successful response with thumbnails list
         return {
             "statusCode": 200,
-            "headers": headers,
-            "body": json.dumps({
+            "headers": CORS_HEADERS,
+            "body": to_json({
                 "thumbnails": thumbnails  # The list of thumbnail names
             })
         }
@@ -94,8 +142,8 @@ def lambda_handler(event, context):
         # In production, you might want to sanitize error messages
         return {
             "statusCode": 500,
-            "headers": headers,
-            "body": json.dumps({
+            "headers": CORS_HEADERS,
+            "body": to_json({
                 "error": "Failed to load thumbnails",  # User-friendly message
                 "details": str(e)  # Technical details for debugging
             })
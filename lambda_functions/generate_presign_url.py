@@ -1,17 +1,159 @@
 import traceback
 import boto3
+from botocore.config import Config
 import json
+import hashlib
+import queue
+import threading
 import os
-from datetime import datetime, timedelta
-import uuid
+from datetime import datetime, timedelta, timezone
+import time
+from secrets import token_hex
+from concurrent.futures import ThreadPoolExecutor
+from boto3.dynamodb.conditions import Attr  # For conditional writes
+from boto3.dynamodb.types import TypeDeserializer  # For items returned on conditional-check failure
 
-# Initialize AWS clients
-s3 = boto3.client('s3')  # For S3 operations
-dynamodb = boto3.resource('dynamodb')  # For DynamoDB operations
+# Use orjson for response serialization when it is bundled with the
+# deployment package, falling back to the standard library otherwise
+try:
+    import orjson
 
-# Initialize DynamoDB table reference
-table_name = 'PhotoShareTable'  # Should match your DynamoDB table name
-table = dynamodb.Table(table_name)  # Reference to our DynamoDB table
+    def to_json(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    def to_json(obj):
+        return json.dumps(obj)
+
+# Shared botocore configuration for the S3 and DynamoDB clients
+# Keep-alive lets warm invocations reuse the open TLS connection
+# instead of repeating the TCP + TLS handshake on every call
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'max_attempts': 3, 'mode': 'adaptive'}
+)
+
+# Initialize AWS clients and configuration once per container
+# Module-level setup runs during the Lambda INIT phase, so warm invocations
+# reuse these objects instead of rebuilding them on every request
+try:
+    s3 = boto3.client('s3', config=boto_config)  # For S3 operations
+    dynamodb = boto3.resource('dynamodb', config=boto_config)  # For DynamoDB operations
+
+    # Initialize DynamoDB table reference
+    table_name = os.environ.get('PHOTO_SHARE_TABLE', 'PhotoShareTable')  # Should match your DynamoDB table name
+    table = dynamodb.Table(table_name)  # Reference to our DynamoDB table
+
+    # Get bucket name from environment variable
+    bucket_name = os.environ['UPLOAD_BUCKET']
+    print(f"Using upload bucket: {bucket_name}")
+
+    # Worker pool for running the DynamoDB write alongside URL signing
+    executor = ThreadPoolExecutor(max_workers=2)
+except KeyError as e:
+    print(f"Initialization failed - missing environment variable: {str(e)}")
+    raise
+except Exception as e:
+    print(f"Initialization failed: {str(e)}")
+    traceback.print_exc()
+    raise
+
+# Converts low-level DynamoDB attribute values (as returned in error
+# responses) into plain Python values
+deserializer = TypeDeserializer()
+
+# CORS headers shared by every response
+CORS_HEADERS = {
+    'Access-Control-Allow-Origin': '*',
+    'Access-Control-Allow-Credentials': True
+}
+
+# --- Buffered Metadata Writes (opt-in) ---
+# With ASYNC_METADATA_WRITES=true the handler queues metadata items and
+# returns without waiting for DynamoDB. A background thread writes them in
+# batches, but only while the execution environment is running: Lambda
+# freezes it as soon as a response is returned, and anything still queued
+# waits for the next invocation. If the environment is reclaimed while idle
+# it is frozen or killed without a normal interpreter exit (no atexit, and
+# no SIGTERM without an extension), so items queued just before an idle
+# period can be lost. Only enable this if losing those rows is acceptable.
+#
+# batch_writer cannot do conditional writes, so requests carrying an
+# Idempotency-Key bypass the buffer and keep the conditional put_item that
+# skips retries. Buffered items therefore always have unique random keys.
+ASYNC_METADATA_WRITES = os.environ.get('ASYNC_METADATA_WRITES', 'false').lower() == 'true'
+BATCH_WRITE_LIMIT = 25  # Maximum items per DynamoDB BatchWriteItem call
+MAX_WRITE_ATTEMPTS = 5  # Attempts per item before it is logged as dropped
+
+# Queue entries are (item, attempts) tuples
+metadata_queue = queue.Queue()
+
+def write_queued_metadata():
+    """
+    Background worker that drains metadata_queue into DynamoDB.
+    
+    Blocks until an item is available, then collects whatever else is
+    already queued (up to BATCH_WRITE_LIMIT) and writes it with a single
+    batch_writer. Failed batches are put back on the queue after a short
+    backoff; items that fail MAX_WRITE_ATTEMPTS times are logged in full
+    so they can be replayed from CloudWatch.
+    """
+    while True:
+        entries = [metadata_queue.get()]
+        while len(entries) < BATCH_WRITE_LIMIT:
+            try:
+                entries.append(metadata_queue.get_nowait())
+            except queue.Empty:
+                break
+        
+        try:
+            with table.batch_writer() as batch:
+                for item, _ in entries:
+                    batch.put_item(Item=item)
+            print(f"Stored {len(entries)} metadata item(s) in DynamoDB")
+        except Exception as e:
+            print(f"Error writing queued metadata: {str(e)}")
+            traceback.print_exc()
+            
+            # Re-queue the batch. Part of it may already be stored; putting
+            # those items again writes the exact item queued by the same
+            # request, and buffered keys are unique, so no other row is touched
+            attempts = max(attempts for _, attempts in entries) + 1
+            time.sleep(min(2 ** attempts, 30))  # Back off before retrying
+            for item, item_attempts in entries:
+                if item_attempts + 1 >= MAX_WRITE_ATTEMPTS:
+                    print(f"Dropping metadata after {MAX_WRITE_ATTEMPTS} attempts: {to_json(item)}")
+                else:
+                    metadata_queue.put((item, item_attempts + 1))
+
+if ASYNC_METADATA_WRITES:
+    threading.Thread(target=write_queued_metadata, daemon=True).start()
+
+def discard_pending_metadata(put_future, unique_filename):
+    """
+    Undoes a metadata write started for a request that is about to fail,
+    so no 'pending' row is left behind for an upload URL that was never issued.
+    
+    Args:
+        put_future (Future): Future returned when the put_item was submitted
+        unique_filename (str): Primary key of the metadata item
+    """
+    # Write never started - nothing to undo
+    if put_future.cancel():
+        return
+    
+    try:
+        put_future.result()
+    except Exception:
+        # Nothing was written by this request (this includes a retry whose
+        # item already exists, which must be kept)
+        return
+    
+    try:
+        table.delete_item(Key={'photoMetadata': unique_filename})
+        print(f"Removed pending metadata for {unique_filename}")
+    except Exception as e:
+        print(f"Warning: Could not remove pending metadata for {unique_filename} - {str(e)}")
 
 def generate_unique_filename(original_name):
     """
@@ -19,28 +161,57 @@ def generate_unique_filename(original_name):
     
     Combines:
     - Original filename base
-    - Current timestamp
-    - Short UUID segment
+    - Current timestamp in nanoseconds (hex)
+    - Short random hex segment
     
     Example:
-    "photo.jpg" → "photo-20230815-143022-abc12345.jpg"
+    "photo.jpg" → "photo-18dece3185c950e7-abc12345.jpg"
     
     Args:
         original_name (str): The original filename from the client
         
     Returns:
-        str: Unique filename with timestamp and UUID components
+        str: Unique filename with timestamp and random components
     """
     # Split filename and extension
     base_name, ext = os.path.splitext(original_name)
     
     # Generate unique components
-    timestamp = datetime.now().strftime("%Y%m%d-%H%M%S")  # YYYYMMDD-HHMMSS format
-    unique_id = str(uuid.uuid4())[:8]  # First 8 characters of UUID
+    timestamp = f"{time.time_ns():x}"  # Nanosecond timestamp as hex
+    unique_id = token_hex(4)  # 8 random hex characters
     
     # Construct new filename
     return f"{base_name}-{timestamp}-{unique_id}{ext}"
 
+def generate_idempotent_filename(original_name, user_email, idempotency_key):
+    """
+    Generates a deterministic filename for requests carrying an idempotency key.
+    
+    A client retrying the same request with the same key receives the same
+    filename, so the retry maps to the same S3 key and DynamoDB item.
+    
+    Example:
+    "photo.jpg" → "photo-3f2a9c1d7e6b5a40.jpg"
+    
+    Args:
+        original_name (str): The original filename from the client
+        user_email (str): Email of the uploading user
+        idempotency_key (str): Client-supplied Idempotency-Key header value
+        
+    Returns:
+        str: Filename with a hash of the request inputs
+    """
+    # Split filename and extension
+    base_name, ext = os.path.splitext(original_name)
+    
+    # Hash the inputs that identify this logical request
+    digest = hashlib.blake2b(
+        f"{user_email}|{original_name}|{idempotency_key}".encode(),
+        digest_size=8
+    ).hexdigest()
+    
+    return f"{base_name}-{digest}{ext}"
+
 def lambda_handler(event, context):
     """
     AWS Lambda handler for generating pre-signed S3 upload URLs.
@@ -61,6 +232,7 @@ def lambda_handler(event, context):
         event (dict): AWS Lambda event containing:
             - body: JSON with fileName and fileType
             - requestContext: Cognito authorizer claims
+            - headers: optional Idempotency-Key for safe retries
         context: AWS Lambda context object
     
     Returns:
@@ -70,17 +242,6 @@ def lambda_handler(event, context):
             - body (JSON string)
     """
     
-    # --- Configuration ---
-    # Get bucket name from environment variable
-    try:
-        bucket_name = os.environ['UPLOAD_BUCKET']
-        print(f"Using upload bucket: {bucket_name}")
-    except KeyError:
-        return {
-            'statusCode': 500,
-            'body': json.dumps({'error': 'Upload bucket not configured'})
-        }
-    
     # --- Request Validation ---
     try:
         # Parse and validate request body
@@ -94,7 +255,7 @@ def lambda_handler(event, context):
     except Exception as e:
         return {
             'statusCode': 400,
-            'body': json.dumps({
+            'body': to_json({
                 'error': 'Invalid request format',
                 'details': str(e)
             })
@@ -113,11 +274,17 @@ def lambda_handler(event, context):
     
     # --- File Preparation ---
     # Generate unique filename to prevent collisions
-    unique_filename = generate_unique_filename(original_name)
+    # Retries carrying the same Idempotency-Key resolve to the same filename
+    request_headers = {k.lower(): v for k, v in (event.get('headers') or {}).items()}
+    idempotency_key = request_headers.get('idempotency-key')
+    if idempotency_key:
+        unique_filename = generate_idempotent_filename(original_name, user_email, idempotency_key)
+    else:
+        unique_filename = generate_unique_filename(original_name)
     thumbnail_key = f"thumb-{unique_filename}"  # Future thumbnail path
     
     # Prepare metadata for tracking
-    upload_date = datetime.utcnow().isoformat()
+    upload_date = datetime.now(timezone.utc).isoformat()
     metadata = {
         'uploadedBy': user_email,
         'originalFileName': original_name,
@@ -128,61 +295,111 @@ def lambda_handler(event, context):
         'status': 'pending'
     }
     
-    # --- Generate Pre-signed URL ---
+    # --- Store Metadata / Generate Pre-signed URL ---
     try:
+        item = {
+            # Primary key
+            'photoMetadata': unique_filename,
+            
+            # File identification
+            'originalFileName': original_name,
+            'thumbnailKey': thumbnail_key,
+            'uniqueFileName': unique_filename,
+            
+            # Storage info
+            'originalBucket': bucket_name,
+            'contentType': file_type,
+            
+            # Ownership tracking
+            'uploadedBy': user_email,
+            'uploadDate': upload_date,
+            
+            # Status fields (to be updated later)
+            'status': 'pending',
+            'fileSize': 0,  # Will be updated after upload
+            'dimensions': '0x0'  # Will be updated after processing
+        }
+        
+        # Idempotent requests need the conditional write, so they are never buffered
+        buffer_write = ASYNC_METADATA_WRITES and not idempotency_key
+        
+        if buffer_write:
+            # Queued after signing succeeds (below)
+            put_future = None
+        else:
+            # Start the DynamoDB write in the background; URL signing is local
+            # and independent, so the two overlap
+            put_future = executor.submit(
+                table.put_item,
+                Item=item,
+                # Skip the write if this filename was already recorded (client retry)
+                ConditionExpression=Attr('photoMetadata').not_exists(),
+                # Return the stored item on a retry so the original request can be replayed
+                ReturnValuesOnConditionCheckFailure='ALL_OLD'
+            )
+        
         # Create pre-signed URL with 1-hour expiration
-        presigned_url = s3.generate_presigned_url(
-            'put_object',
-            Params={
-                'Bucket': bucket_name,
-                'Key': unique_filename,
-                'ContentType': file_type,
-                'Metadata': {
-                    'uploadedBy': user_email,
-                    'originalFileName': original_name,
-                    'thumbnailKey': thumbnail_key,
-                    'uniqueFileName': unique_filename
-                }
-            },
-            ExpiresIn=3600  # 1 hour expiration
-        )
+        try:
+            presigned_url = s3.generate_presigned_url(
+                'put_object',
+                Params={
+                    'Bucket': bucket_name,
+                    'Key': unique_filename,
+                    'ContentType': file_type,
+                    'Metadata': {
+                        'uploadedBy': user_email,
+                        'originalFileName': original_name,
+                        'thumbnailKey': thumbnail_key,
+                        'uniqueFileName': unique_filename
+                    }
+                },
+                ExpiresIn=3600  # 1 hour expiration
+            )
+        except Exception:
+            if put_future is not None:
+                discard_pending_metadata(put_future, unique_filename)
+            raise
         print(f"Generated pre-signed URL for {unique_filename}")
         
-        # --- Store Metadata in DynamoDB ---
-        table.put_item(
-            Item={
-                # Primary key
-                'photoMetadata': unique_filename,
-                
-                # File identification
-                'originalFileName': original_name,
-                'thumbnailKey': thumbnail_key,
-                'uniqueFileName': unique_filename,
-                
-                # Storage info
-                'originalBucket': bucket_name,
-                'contentType': file_type,
+        if buffer_write:
+            # Hand the item to the background batch writer now that the
+            # upload URL exists, so a signing failure never leaves a row
+            metadata_queue.put((item, 0))
+        
+        # Wait for the metadata write before responding
+        # No extra timeout here: returning early would leave the write running
+        # after an error response (botocore's own timeouts bound the wait)
+        if put_future is not None:
+            try:
+                put_future.result()
+                print(f"Stored metadata for {unique_filename} in DynamoDB")
+            except table.meta.client.exceptions.ConditionalCheckFailedException as e:
+                print(f"Metadata for {unique_filename} already stored - treating as retry")
+                stored = {
+                    key: deserializer.deserialize(value)
+                    for key, value in e.response.get('Item', {}).items()
+                }
                 
-                # Ownership tracking
-                'uploadedBy': user_email,
-                'uploadDate': upload_date,
+                # The URL was signed for this request's ContentType; a retry
+                # that changes it conflicts with the stored upload
+                if stored.get('contentType', file_type) != file_type:
+                    return {
+                        'statusCode': 409,
+                        'headers': CORS_HEADERS,
+                        'body': to_json({
+                            'error': 'Idempotency-Key already used for a different request',
+                            'details': f"Stored fileType is {stored['contentType']}"
+                        })
+                    }
                 
-                # Status fields (to be updated later)
-                'status': 'pending',
-                'fileSize': 0,  # Will be updated after upload
-                'dimensions': '0x0'  # Will be updated after processing
-            }
-        )
-        print(f"Stored metadata for {unique_filename} in DynamoDB")
+                # Replay the original request's metadata (e.g. its uploadDate)
+                metadata = {key: stored.get(key, value) for key, value in metadata.items()}
         
         # --- Success Response ---
         return {
             'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True
-            },
-            'body': json.dumps({
+            'headers': CORS_HEADERS,
+            'body': to_json({
                 'presignedUrl': presigned_url,
                 'originalFileName': original_name,
                 'uniqueFileName': unique_filename,
@@ -196,11 +413,8 @@ def lambda_handler(event, context):
         traceback.print_exc()
         return {
             'statusCode': 500,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Credentials': True
-            },
-            'body': json.dumps({
+            'headers': CORS_HEADERS,
+            'body': to_json({
                 'error': 'Failed to generate upload URL',
                 'details': str(e)
             })
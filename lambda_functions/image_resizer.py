@@ -1,14 +1,48 @@
 import json
 import boto3
-from PIL import Image  # Python Imaging Library for image processing
+from botocore.config import Config
+from PIL import Image, ImageFile, UnidentifiedImageError  # Python Imaging Library for image processing
 import io  # For handling byte streams
 import os
+import logging
+import shutil  # For chunked copying of the S3 stream
 from urllib.parse import unquote_plus  # For URL decoding S3 keys
+import traceback
 import uuid
-from datetime import datetime
+from datetime import datetime, timezone
 
-# Initialize the S3 client
-s3 = boto3.client('s3')
+# Use orjson for response serialization when it is bundled with the
+# deployment package, falling back to the standard library otherwise
+try:
+    import orjson
+
+    def to_json(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    def to_json(obj):
+        return json.dumps(obj)
+
+# Module-level logger; level is configurable through LOG_LEVEL
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+# botocore client configuration
+# Reuses the S3 connection across warm invocations (get + put per image)
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'max_attempts': 3, 'mode': 'adaptive'}
+)
+
+# Initialize the S3 client once per container
+# Creating it at import time keeps credential resolution and botocore model
+# loading in the Lambda INIT phase instead of on every warm invocation
+try:
+    s3 = boto3.client('s3', config=boto_config)
+except Exception as e:
+    print(f"Initialization failed: {str(e)}")
+    traceback.print_exc()
+    raise
 
 # Dictionary of supported image formats with their corresponding:
 # - PIL format identifiers
@@ -23,6 +57,19 @@ SUPPORTED_FORMATS = {
     'tiff': {'format': 'TIFF', 'content_type': 'image/tiff'}
 }
 
+# Largest upload (in bytes) that will be downloaded and thumbnailed
+MAX_IMAGE_SIZE = int(os.environ.get('MAX_IMAGE_SIZE', 25 * 1024 * 1024))
+
+# Fail on truncated uploads when pixel data is decoded instead of
+# silently producing a partially grey thumbnail
+ImageFile.LOAD_TRUNCATED_IMAGES = False
+
+# Register all Pillow format plugins and run one tiny JPEG encode at import
+# so codec setup happens during cold start rather than on the first request
+Image.preinit()
+Image.init()
+Image.new('RGB', (1, 1)).save(io.BytesIO(), format='JPEG')
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to generate thumbnails from uploaded images.
@@ -49,8 +96,9 @@ def lambda_handler(event, context):
         source_bucket = event['Records'][0]['s3']['bucket']['name']
         raw_key = event['Records'][0]['s3']['object']['key']
         source_key = unquote_plus(raw_key)  # Decode URL-encoded characters
+        object_size = event['Records'][0]['s3']['object']['size']
         
-        print(f"Processing image: s3://{source_bucket}/{source_key}")
+        logger.info("Processing image: s3://%s/%s", source_bucket, source_key)
         
         # --- Validate File Format ---
         # Extract file extension and check against supported formats
@@ -62,95 +110,133 @@ def lambda_handler(event, context):
                 f"Supported formats: {supported}"
             )
         
+        # --- Validate File Size ---
+        # The size comes with the S3 event, so oversized uploads are skipped
+        # before any download. Return 200 so the event is not retried.
+        if object_size > MAX_IMAGE_SIZE:
+            logger.info("Skipping %s: %d bytes exceeds limit of %d bytes",
+                        source_key, object_size, MAX_IMAGE_SIZE)
+            return {
+                'statusCode': 200,
+                'body': to_json({
+                    'message': 'Image too large, thumbnail skipped',
+                    'original_key': source_key,
+                    'size': object_size,
+                    'max_size': MAX_IMAGE_SIZE
+                })
+            }
+        
+        # Resolve format details and the target key once up front
+        format_info = SUPPORTED_FORMATS[file_extension]
+        pil_format = format_info['format']
+        content_type = format_info['content_type']
+        
+        # Generate target key with 'thumb-' prefix
+        target_key = f"thumb-{source_key}"
+        
         # --- Download Image ---
-        # Get the image object from S3 and read its contents
+        # Get the image object from S3
         response = s3.get_object(Bucket=source_bucket, Key=source_key)
-        image_data = response['Body'].read()
         
         # Validate we actually received image data
-        if not image_data:
+        if not response.get('ContentLength'):
             raise ValueError("Downloaded image is empty (0 bytes)")
         
         # --- Image Verification ---
-        # Create an in-memory buffer for the image data
-        image_buffer = io.BytesIO(image_data)
+        # Stream the body into an in-memory buffer in chunks rather than
+        # reading it into a separate bytes object first
+        image_buffer = io.BytesIO()
+        shutil.copyfileobj(response['Body'], image_buffer, 256 * 1024)
         image_buffer.seek(0)  # Reset buffer position to start
         
-        # First pass: Verify the image is valid
+        # Opening parses the header only; corrupt or truncated pixel data
+        # raises later when the thumbnail is decoded
         try:
-            with Image.open(image_buffer) as image:
-                image.verify()  # Verify file integrity without loading pixels
-        except Exception as verify_error:
-            raise ValueError(f"Invalid image file: {str(verify_error)}")
+            image = Image.open(image_buffer)
+        except (UnidentifiedImageError, OSError) as open_error:
+            raise ValueError(f"Invalid image file: {str(open_error)}")
         
         # --- Image Processing ---
-        # Reset buffer for actual processing
-        image_buffer.seek(0)
-        with Image.open(image_buffer) as image:
+        with image:
             # Extract metadata from original upload
             metadata = response.get('Metadata', {})
             user_email = metadata.get('uploadedBy', 'unknown')
             
+            # Get original dimensions (before draft mode shrinks the image)
+            width, height = image.size
+            original_dimensions = f"{width}x{height}"
+            
+            # thumbnail() already requests draft mode for JPEGs, but only if
+            # the pixels are not loaded yet. The convert() below loads them for
+            # CMYK/L JPEGs, so request the reduced-scale decode up front here.
+            # For RGB JPEGs this is the same draft thumbnail() would apply.
+            if pil_format == 'JPEG':
+                image.draft('RGB', (300, 300))
+            
             # Convert JPEG images to RGB mode if they aren't already
             # This prevents issues with CMYK or other color spaces
-            if file_extension in ['jpg', 'jpeg'] and image.mode != 'RGB':
+            if pil_format == 'JPEG' and image.mode != 'RGB':
                 image = image.convert('RGB')
             
-            # Get original dimensions
-            width, height = image.size
-            
             # Create thumbnail (max 150x150 while maintaining aspect ratio)
-            image.thumbnail((150, 150))
+            # Bilinear is visually equivalent at this size and is the fastest
+            # resize path in Pillow-SIMD
+            image.thumbnail((150, 150), Image.BILINEAR)
             thumb_width, thumb_height = image.size
+            thumbnail_dimensions = f"{thumb_width}x{thumb_height}"
             
             # --- Prepare Thumbnail for Upload ---
-            thumb_buffer = io.BytesIO()
-            image.save(
-                thumb_buffer,
-                format=SUPPORTED_FORMATS[file_extension]['format'],
-                quality=85  # Good balance between quality and file size
-            )
-            thumb_buffer.seek(0)  # Reset buffer position after saving
+            save_options = {'quality': 85}  # Good balance between quality and file size
+            if pil_format == 'JPEG':
+                # Single-pass baseline encode; other formats keep their
+                # defaults (e.g. GIF palette optimization)
+                save_options['optimize'] = False  # Skip the extra Huffman optimization pass
+                save_options['progressive'] = False  # Single-scan baseline encode
             
-            # Generate target key with 'thumb-' prefix
-            target_key = f"thumb-{source_key}"
+            thumb_buffer = io.BytesIO()
+            image.save(thumb_buffer, format=pil_format, **save_options)
+            # Take the encoded bytes once; a known length lets botocore
+            # send the body without re-reading the buffer to size it
+            thumb_body = thumb_buffer.getvalue()
             
             # --- Upload Thumbnail ---
             s3.put_object(
                 Bucket="photo-sharing-bucket-thumbnail",
                 Key=target_key,
-                Body=thumb_buffer,
-                ContentType=SUPPORTED_FORMATS[file_extension]['content_type'],
+                Body=thumb_body,
+                ContentLength=len(thumb_body),
+                ContentType=content_type,
                 Metadata={
                     'original-key': source_key,
                     'processed-by': 'thumbnail-generator',
                     'uploadedBy': user_email,  # Preserve uploader info
-                    'original-dimensions': f"{width}x{height}",
-                    'thumbnail-dimensions': f"{thumb_width}x{thumb_height}",
-                    'processing-date': datetime.utcnow().isoformat()
+                    'original-dimensions': original_dimensions,
+                    'thumbnail-dimensions': thumbnail_dimensions,
+                    'processing-date': datetime.now(timezone.utc).isoformat()
                 }
             )
         
         # --- Success Response ---
         return {
             'statusCode': 200,
-            'body': json.dumps({
+            'body': to_json({
                 'message': 'Thumbnail created successfully',
                 'thumbnail_key': target_key,
                 'original_key': source_key,
-                'original_dimensions': f"{width}x{height}",
-                'thumbnail_dimensions': f"{thumb_width}x{thumb_height}"
+                'original_dimensions': original_dimensions,
+                'thumbnail_dimensions': thumbnail_dimensions
             })
         }
         
     except Exception as e:
         # --- Error Handling ---
-        error_message = f"Error processing {source_key if 'source_key' in locals() else 'unknown'}: {str(e)}"
-        print(error_message)
+        # logger.exception also records the stack trace
+        logger.exception("Error processing %s: %s",
+                         source_key if 'source_key' in locals() else 'unknown', e)
         
         return {
             'statusCode': 500,
-            'body': json.dumps({
+            'body': to_json({
                 'error': str(e),
                 'object_key': source_key if 'source_key' in locals() else 'unknown',
                 'stack_trace': traceback.format_exc() if 'traceback' in globals() else 'Not available'
@@ -1,17 +1,92 @@
 import json
+import base64  # For encoding pagination cursors
 import boto3
+from botocore.config import Config
 import os
+import logging
 import traceback
+from operator import itemgetter
 from boto3.dynamodb.conditions import Key  # For DynamoDB key conditions
 
+# Use orjson for response serialization when it is bundled with the
+# deployment package, falling back to the standard library otherwise
+try:
+    import orjson
+
+    def to_json(obj):
+        return orjson.dumps(obj).decode()
+except ImportError:
+    def to_json(obj):
+        return json.dumps(obj)
+
+# Module-level logger; set LOG_LEVEL=DEBUG to log full incoming events
+logger = logging.getLogger()
+logger.setLevel(os.environ.get('LOG_LEVEL', 'INFO'))
+
+# botocore configuration for the DynamoDB resource
+# Keep-alive avoids a fresh TLS handshake on each warm query
+boto_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=10,
+    retries={'max_attempts': 3, 'mode': 'adaptive'}
+)
+
 # Initialize DynamoDB resource
 # Using resource interface for higher-level abstraction
-dynamodb = boto3.resource('dynamodb')
+dynamodb = boto3.resource('dynamodb', config=boto_config)
 
 # Get table name (consider using environment variable in production)
 table_name = os.environ.get('PHOTO_SHARE_TABLE', 'PhotoShareTable')  # Default to 'PhotoShareTable' if not set
 table = dynamodb.Table(table_name)  # Reference to our DynamoDB table
 
+# Pre-built accessor for the attributes returned to the client
+get_thumbnail_fields = itemgetter('thumbnailKey', 'originalFileName')
+
+# CORS headers configuration
+# These headers enable cross-origin requests from web browsers
+CORS_HEADERS = {
+    "Content-Type": "application/json",
+    "Access-Control-Allow-Origin": "*",  # Allow any origin (restrict in production)
+    "Access-Control-Allow-Headers": "Content-Type, Authorization",  # Allowed headers
+    "Access-Control-Allow-Methods": "GET, OPTIONS"  # Allowed HTTP methods
+}
+
+# Static response returned for every CORS preflight request
+CORS_PREFLIGHT_RESPONSE = {
+    "statusCode": 200,
+    "headers": CORS_HEADERS,
+    "body": to_json({"message": "CORS preflight OK"})
+}
+
+def encode_cursor(last_evaluated_key):
+    """
+    Encodes a DynamoDB LastEvaluatedKey as an opaque, URL-safe cursor.
+    
+    Args:
+        last_evaluated_key (dict): LastEvaluatedKey from a query response
+        
+    Returns:
+        str: Base64-encoded JSON cursor, or None if there are no more pages
+    """
+    if not last_evaluated_key:
+        return None
+    return base64.urlsafe_b64encode(to_json(last_evaluated_key).encode()).decode()
+
+def decode_cursor(cursor):
+    """
+    Decodes a cursor produced by encode_cursor back into an ExclusiveStartKey.
+    
+    Args:
+        cursor (str): Cursor received from the client
+        
+    Returns:
+        dict: ExclusiveStartKey to pass to DynamoDB query
+    """
+    start_key = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    if not isinstance(start_key, dict):
+        raise ValueError("Malformed cursor")
+    return start_key
+
 def lambda_handler(event, context):
     """
     AWS Lambda function to query user's photo thumbnails from DynamoDB.
@@ -19,8 +94,8 @@ def lambda_handler(event, context):
     This function:
     1. Handles CORS preflight OPTIONS requests
     2. Extracts user email from Cognito JWT claims
-    3. Queries DynamoDB using GSI (uploadedByIndex)
-    4. Returns thumbnail metadata in a structured format
+    3. Queries one page of DynamoDB results using GSI (uploadedByIndex)
+    4. Returns thumbnail metadata and a cursor for the next page
     
     Security:
     - Uses Cognito for authentication
@@ -31,6 +106,7 @@ def lambda_handler(event, context):
         event (dict): AWS Lambda event containing:
             - HTTP method and headers
             - Cognito authorizer claims
+            - Optional queryStringParameters: limit, cursor
         context (object): AWS Lambda context object
     
     Returns:
@@ -40,27 +116,14 @@ def lambda_handler(event, context):
             - body (JSON string)
     """
     
-    # CORS headers configuration
-    # These headers enable cross-origin requests from web browsers
-    headers = {
-        "Content-Type": "application/json",
-        "Access-Control-Allow-Origin": "*",  # Allow any origin (restrict in production)
-        "Access-Control-Allow-Headers": "Content-Type, Authorization",  # Allowed headers
-        "Access-Control-Allow-Methods": "GET, OPTIONS"  # Allowed HTTP methods
-    }
-
     # Log the incoming event for debugging (sanitize in production)
-    print("Received event:", json.dumps(event, indent=2))
+    # The event is only formatted when DEBUG logging is enabled
+    logger.debug("Received event: %s", event)
 
     # --- Handle CORS Preflight Request ---
     # Browsers send OPTIONS requests first to check CORS permissions
     if event.get("httpMethod") == "OPTIONS":
-        print("Handling CORS preflight request")
-        return {
-            "statusCode": 200,
-            "headers": headers,
-            "body": json.dumps({"message": "CORS preflight OK"})
-        }
+        return CORS_PREFLIGHT_RESPONSE
 
     # --- Extract User Identity ---
     try:
@@ -79,23 +142,61 @@ def lambda_handler(event, context):
         traceback.print_exc()
         return {
             "statusCode": 401,
-            "headers": headers,
-            "body": json.dumps({
+            "headers": CORS_HEADERS,
+            "body": to_json({
                 "error": "Unauthorized",
                 "details": str(e),
                 "message": "Failed to authenticate user"
             })
         }
 
+    # --- Parse Pagination Parameters ---
+    # Optional query string parameters:
+    # - limit: maximum number of thumbnails to return in this page
+    # - cursor: opaque token from a previous response's nextCursor
+    try:
+        params = event.get('queryStringParameters') or {}
+        
+        limit = params.get('limit')
+        if limit is not None:
+            limit = int(limit)
+            if limit <= 0:
+                raise ValueError("limit must be a positive integer")
+        
+        start_key = decode_cursor(params['cursor']) if params.get('cursor') else None
+        if start_key is not None and start_key.get('uploadedBy') != user_email:
+            raise ValueError("cursor does not belong to this user")
+            
+    except Exception as e:
+        return {
+            "statusCode": 400,
+            "headers": CORS_HEADERS,
+            "body": to_json({
+                "error": "Invalid pagination parameters",
+                "details": str(e),
+                "message": "Check the limit and cursor query parameters"
+            })
+        }
+
     # --- Query DynamoDB ---
     try:
         # Query using Global Secondary Index (GSI) on uploadedBy
         # This allows efficient lookup of all items for a user
-        response = table.query(
-            IndexName='uploadedByIndex',  # Name of our GSI
-            KeyConditionExpression=Key('uploadedBy').eq(user_email)  # Exact match on email
-            # Consider adding Limit and pagination for production
-        )
+        query_args = {
+            'IndexName': 'uploadedByIndex',  # Name of our GSI
+            'KeyConditionExpression': Key('uploadedBy').eq(user_email),  # Exact match on email
+            # Only fetch the attributes returned to the client
+            # uploadedByIndex must project both; a GSI query never reads the
+            # base table, so unprojected attributes are simply missing
+            'ProjectionExpression': 'thumbnailKey, originalFileName'
+        }
+        if limit is not None:
+            query_args['Limit'] = limit
+        if start_key is not None:
+            query_args['ExclusiveStartKey'] = start_key  # Resume after the previous page
+        
+        # Each invocation returns a single page (at most 1MB of items)
+        response = table.query(**query_args)
 
         # Get items or default to empty list if none found
         items = response.get('Items', [])
@@ -104,24 +205,24 @@ def lambda_handler(event, context):
         # Transform DynamoDB items into client-friendly format
         thumbnails = [
             {
-                "name": item["thumbnailKey"],  # S3 key for thumbnail
-                "originalFileName": item["originalFileName"],  # Original filename
+                "name": thumbnail_key,  # S3 key for thumbnail
+                "originalFileName": original_name,  # Original filename
                 # Consider adding more metadata like:
                 # "uploadDate": item.get("uploadDate"),
                 # "dimensions": item.get("dimensions")
             } 
-            for item in items
+            for thumbnail_key, original_name in map(get_thumbnail_fields, items)
         ]
 
         # Successful response
         return {
             "statusCode": 200,
-            "headers": headers,
-            "body": json.dumps({
+            "headers": CORS_HEADERS,
+            "body": to_json({
                 "thumbnails": thumbnails,
-                "count": len(thumbnails)
-                # Consider adding pagination info:
-                # "lastEvaluatedKey": response.get('LastEvaluatedKey')
+                "count": len(thumbnails),
+                # Cursor for the next page, or null when there are no more items
+                "nextCursor": encode_cursor(response.get('LastEvaluatedKey'))
             })
         }
 
@@ -130,8 +231,8 @@ def lambda_handler(event, context):
         traceback.print_exc()
         return {
             "statusCode": 500,
-            "headers": headers,
-            "body": json.dumps({
+            "headers": CORS_HEADERS,
+            "body": to_json({
                 "error": "Failed to fetch thumbnails",
                 "details": str(e),
                 "message": "Server error while processing your request"